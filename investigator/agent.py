@@ -22,7 +22,9 @@ root_agent = Agent(
         "- get_risk_score_cached：獲取並緩存風險評分\n"
         "- get_address_actions_cached：獲取並緩存地址操作\n"
         "- get_address_profile_cached：獲取並緩存地址資料\n"
-        "- get_investigation_summary：獲取當前調查的摘要信息\n\n"
+        "- get_risk_propagation：根據已緩存的交易和風險評分計算風險擴散暴露度\n"
+        "- get_investigation_summary：獲取當前調查的摘要信息\n"
+        "- export_investigation_snapshot / import_investigation_snapshot：導出或恢復調查快照，恢復時無需重新調用 API\n\n"
         
         "當用戶要求查詢地址的交易並要視覺化結果時，請按照以下步驟：\n"
         "1. 使用 misttrack_agent 的 get_transactions_and_store 函數獲取並緩存交易數據\n"
@@ -49,7 +51,9 @@ root_agent = Agent(
         # - get_risk_score_cached: Get and cache risk scores
         # - get_address_actions_cached: Get and cache address actions
         # - get_address_profile_cached: Get and cache address profile
+        # - get_risk_propagation: Compute risk exposure spreading through cached transactions and risk scores
         # - get_investigation_summary: Get summary information for the current investigation
+        # - export_investigation_snapshot / import_investigation_snapshot: Export or restore an investigation snapshot without calling the API again
         #
         # When a user asks to query an address's transactions and visualize the results, follow these steps:
         # 1. Use misttrack_agent's get_transactions_and_store function to retrieve and cache transaction data
@@ -0,0 +1 @@
+from . import harness
\ No newline at end of file
@@ -0,0 +1,41 @@
+import argparse
+import asyncio
+import json
+
+from investigator.loadtest.harness import run_load_test
+from investigator.loadtest.scripted_llm import build_scripts, load_scripts
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m investigator.loadtest",
+        description="使用腳本模型和本地模擬 MistTrack API 對 root_agent 進行並發壓力測試。"
+    )
+    parser.add_argument("-n", "--sessions", type=int, default=50, help="會話總數")
+    parser.add_argument("-c", "--concurrency", type=int, default=None, help="同時運行的會話數（默認全部）")
+    parser.add_argument("--distinct-addresses", type=int, default=None, help="不同地址數（默認每個會話一個）")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="模擬 API 延遲（秒）")
+    parser.add_argument("--tx-count", type=int, default=50, help="每次交易調查返回的交易數")
+    parser.add_argument("--coin", default=None, help="工具調用使用的幣種")
+    parser.add_argument("--skip-render", action="store_true", help="跳過圖表渲染（未安裝 Graphviz 時使用）")
+    parser.add_argument("--scripts", default=None, help="錄製的工具調用序列 JSON 文件，覆蓋同名代理的默認腳本")
+    args = parser.parse_args()
+
+    scripts = build_scripts(skip_render=args.skip_render, coin=args.coin)
+    if args.scripts:
+        try:
+            scripts = load_scripts(args.scripts, base=scripts)
+        except (OSError, ValueError) as e:
+            parser.error(f"無法讀取腳本文件: {e}")
+
+    report = asyncio.run(run_load_test(
+        sessions=args.sessions,
+        concurrency=args.concurrency,
+        distinct_addresses=args.distinct_addresses,
+        api_latency=args.api_latency,
+        tx_count=args.tx_count,
+        scripts=scripts,
+    ))
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+from typing import Dict, Any, Tuple
+import asyncio
+import hashlib
+import random
+import socket
+
+from aiohttp import web
+
+def _rng(*parts: str) -> random.Random:
+    """按請求參數生成確定性的隨機數生成器，同一地址總是得到相同響應。"""
+    seed = hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+    return random.Random(int(seed[:16], 16))
+
+def _address(rng: random.Random) -> str:
+    return "0x" + "".join(rng.choice("0123456789abcdef") for _ in range(40))
+
+class FakeMistTrack:
+    """
+    本地模擬的 MistTrack API，返回與真實響應結構一致的確定性數據，用於壓力測試。
+    """
+    def __init__(self, latency: float = 0.0, tx_count: int = 50):
+        """
+        參數:
+            latency: 每個請求的模擬網絡延遲（秒）
+            tx_count: 每次交易調查返回的交易數量
+        """
+        self._latency = latency
+        self._tx_count = tx_count
+        self.request_counts: Dict[str, int] = {}
+
+    def _app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/status", self._handle(self._status))
+        app.router.add_get("/address_labels", self._handle(self._labels))
+        app.router.add_get("/address_overview", self._handle(self._overview))
+        app.router.add_get("/risk_score", self._handle(self._risk_score))
+        app.router.add_get("/transactions_investigation", self._handle(self._transactions))
+        app.router.add_get("/address_action", self._handle(self._actions))
+        app.router.add_get("/address_trace", self._handle(self._profile))
+        return app
+
+    def _handle(self, build):
+        async def handler(request: web.Request) -> web.Response:
+            self.request_counts[request.path] = self.request_counts.get(request.path, 0) + 1
+            if self._latency:
+                await asyncio.sleep(self._latency)
+            return web.json_response(build(request.query))
+        return handler
+
+    def _status(self, query) -> Dict[str, Any]:
+        return {"success": True, "msg": "ok"}
+
+    def _labels(self, query) -> Dict[str, Any]:
+        rng = _rng("labels", query.get("address", ""))
+        return {"success": True, "data": {"label_list": rng.sample(["exchange", "defi", "mixer", "phishing", "whale"], 2)}}
+
+    def _overview(self, query) -> Dict[str, Any]:
+        rng = _rng("overview", query.get("address", ""))
+        return {"success": True, "data": {"balance": round(rng.uniform(0, 100), 4), "txs_count": rng.randint(1, 5000)}}
+
+    def _risk_score(self, query) -> Dict[str, Any]:
+        rng = _rng("risk", query.get("address", ""), query.get("txid", ""))
+        return {"success": True, "data": {"score": rng.randint(0, 100), "hacking_event": "", "detail_list": []}}
+
+    def _transactions(self, query) -> Dict[str, Any]:
+        address = query.get("address", "")
+        rng = _rng("tx", address, query.get("type", "all"), query.get("page", "1"))
+        transactions = []
+        for i in range(self._tx_count):
+            counterparty = _address(rng)
+            outgoing = rng.random() < 0.5
+            transactions.append({
+                "hash": f"0x{rng.getrandbits(256):064x}",
+                "from_address": address if outgoing else counterparty,
+                "to_address": counterparty if outgoing else address,
+                "value": round(rng.uniform(0.01, 50), 6),
+                "timestamp": f"2024-01-{i % 28 + 1:02d} 12:00:00"
+            })
+        return {"success": True, "data": {"transactions": transactions}}
+
+    def _actions(self, query) -> Dict[str, Any]:
+        rng = _rng("actions", query.get("address", ""))
+        return {"success": True, "data": {"received_txs": [{"action": "Exchange", "proportion": rng.randint(0, 100)}]}}
+
+    def _profile(self, query) -> Dict[str, Any]:
+        rng = _rng("profile", query.get("address", ""))
+        return {"success": True, "data": {"first_address": _address(rng), "use_platform": {}}}
+
+    async def start(self, host: str = "127.0.0.1") -> Tuple[web.AppRunner, str]:
+        """
+        在隨機端口上啟動服務。
+
+        返回:
+            (AppRunner, 基礎 URL)，結束時調用 runner.cleanup()
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind((host, 0))
+        runner = web.AppRunner(self._app(), access_log=None)
+        await runner.setup()
+        await web.SockSite(runner, sock).start()
+        return runner, f"http://{host}:{sock.getsockname()[1]}"
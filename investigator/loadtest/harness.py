@@ -0,0 +1,231 @@
+from typing import Dict, Any, List, Iterator, Optional
+from contextlib import contextmanager
+import asyncio
+import gc
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+from google.adk.agents import BaseAgent, LlmAgent
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+
+from investigator.agent import root_agent
+from investigator.services import misttrack
+from investigator.services.shared_cache import SharedCache
+from investigator.services.state import SessionState, session_state
+from investigator.loadtest.fake_api import FakeMistTrack
+from investigator.loadtest.scripted_llm import ScriptedLlm, ScriptStep, DEFAULT_SCRIPTS
+
+APP_NAME = "investigator_loadtest"
+
+def _iter_agents(agent: BaseAgent) -> Iterator[BaseAgent]:
+    yield agent
+    for sub_agent in agent.sub_agents:
+        yield from _iter_agents(sub_agent)
+
+@contextmanager
+def scripted_agents(agent: BaseAgent, scripts: Dict[str, List[ScriptStep]]) -> Iterator[None]:
+    """暫時把代理樹中每個 LlmAgent 的模型替換為對應腳本的 ScriptedLlm。"""
+    original_models = {}
+    try:
+        for node in _iter_agents(agent):
+            if isinstance(node, LlmAgent) and node.name in scripts:
+                original_models[node.name] = (node, node.model)
+                node.model = ScriptedLlm(model=f"scripted-{node.name}", script=scripts[node.name])
+        yield
+    finally:
+        for node, model in original_models.values():
+            node.model = model
+
+@contextmanager
+def misttrack_endpoint(base_url: str) -> Iterator[None]:
+    """暫時把 MistTrack 請求指向本地模擬服務。"""
+    original = (misttrack.BASE_URL, misttrack.API_KEY)
+    misttrack.BASE_URL = base_url
+    misttrack.API_KEY = misttrack.API_KEY or "loadtest"
+    try:
+        yield
+    finally:
+        misttrack.BASE_URL, misttrack.API_KEY = original
+
+@contextmanager
+def isolated_session_state() -> Iterator[None]:
+    """
+    暫時把全局會話狀態換成空狀態，結束後恢復原有的調查數據。
+    代理工具在導入時綁定了 session_state 對象本身，因此原地替換其內容而不是替換對象。
+    """
+    saved = dict(vars(session_state))
+    SessionState.__init__(session_state, shared_cache=saved["_shared_cache"])
+    try:
+        yield
+    finally:
+        session_state.clear()
+        shutil.rmtree(session_state._temp_dir, ignore_errors=True)
+        vars(session_state).clear()
+        vars(session_state).update(saved)
+
+@contextmanager
+def isolated_shared_cache() -> Iterator[bool]:
+    """
+    配置了共享緩存時，改用一個空的臨時目錄，避免之前運行留下的緩存影響結果。
+
+    返回:
+        是否啟用了共享緩存
+    """
+    previous = session_state.set_shared_cache(None)
+    if previous is None:
+        yield False
+        return
+
+    directory = tempfile.mkdtemp(prefix="loadtest_cache_")
+    session_state.set_shared_cache(SharedCache(directory, previous.ttl))
+    try:
+        yield True
+    finally:
+        session_state.set_shared_cache(previous)
+        shutil.rmtree(directory, ignore_errors=True)
+
+def _current_rss_kb() -> Optional[int]:
+    """讀取當前常駐內存（KB），非 Linux 系統返回 None。"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") // 1024
+
+def _percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+def _summarize(samples: List[float]) -> Dict[str, float]:
+    """將秒為單位的樣本匯總為毫秒統計。"""
+    return {
+        "count": len(samples),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 3) if samples else 0.0,
+        "p50_ms": round(_percentile(samples, 0.5) * 1000, 3),
+        "p95_ms": round(_percentile(samples, 0.95) * 1000, 3),
+        "max_ms": round(max(samples, default=0.0) * 1000, 3),
+    }
+
+async def _monitor_loop_lag(samples: List[float], interval: float, stop: asyncio.Event) -> None:
+    """定期睡眠並記錄實際喚醒的延遲，用於衡量事件循環是否被阻塞。"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(loop.time() - started - interval, 0.0))
+
+async def _run_session(
+    runner: InMemoryRunner,
+    address: str,
+    tool_latencies: Dict[str, List[float]],
+    session_latencies: List[float],
+    errors: List[str]
+) -> None:
+    user_id = f"user_{uuid.uuid4().hex[:8]}"
+    session = runner.session_service.create_session(app_name=APP_NAME, user_id=user_id)
+    message = types.Content(role="user", parts=[types.Part(text=f"請調查 ETH 地址 {address} 的交易並生成圖表。")])
+
+    # 工具調用事件在工具執行前產出，響應事件在執行後產出，兩者的間隔即工具耗時
+    pending_calls: Dict[str, tuple] = {}
+    started = time.perf_counter()
+    try:
+        async for event in runner.run_async(user_id=user_id, session_id=session.id, new_message=message):
+            now = time.perf_counter()
+            for call in event.get_function_calls():
+                pending_calls[call.id] = (call.name, now)
+            for response in event.get_function_responses():
+                if response.id in pending_calls:
+                    name, called_at = pending_calls.pop(response.id)
+                    tool_latencies.setdefault(name, []).append(now - called_at)
+    except Exception as e:
+        errors.append(f"{type(e).__name__}: {e}")
+        return
+    session_latencies.append(time.perf_counter() - started)
+
+async def run_load_test(
+    sessions: int = 50,
+    concurrency: Optional[int] = None,
+    distinct_addresses: Optional[int] = None,
+    api_latency: float = 0.05,
+    tx_count: int = 50,
+    scripts: Optional[Dict[str, List[ScriptStep]]] = None,
+    lag_interval: float = 0.01
+) -> Dict[str, Any]:
+    """
+    以腳本模型和本地模擬 API 並發運行多個 root_agent 會話並收集性能數據。
+    運行期間使用空的會話狀態，結束後恢復進程中原有的調查數據。
+
+    參數:
+        sessions: 會話總數
+        concurrency: 同時運行的會話數，默認全部同時運行
+        distinct_addresses: 調查的不同地址數，小於會話數時可觀察緩存命中效果
+        api_latency: 模擬 API 的每請求延遲（秒）
+        tx_count: 每次交易調查返回的交易數
+        scripts: 各代理的腳本，默認使用 DEFAULT_SCRIPTS
+        lag_interval: 事件循環延遲採樣間隔（秒）
+
+    返回:
+        包含吞吐量、工具耗時、事件循環延遲和內存使用的報告；
+        內存為運行前後的當前常駐內存之差，會話結束後仍保存在會話服務中，因此可以反映每個會話的佔用
+    """
+    fake_api = FakeMistTrack(latency=api_latency, tx_count=tx_count)
+    api_runner, base_url = await fake_api.start()
+    runner = InMemoryRunner(agent=root_agent, app_name=APP_NAME)
+
+    address_count = distinct_addresses or sessions
+    addresses = [f"0x{i:040x}" for i in range(1, address_count + 1)]
+    semaphore = asyncio.Semaphore(concurrency or sessions)
+
+    tool_latencies: Dict[str, List[float]] = {}
+    session_latencies: List[float] = []
+    lag_samples: List[float] = []
+    errors: List[str] = []
+
+    async def bounded(index: int) -> None:
+        async with semaphore:
+            await _run_session(runner, addresses[index % address_count], tool_latencies, session_latencies, errors)
+
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(_monitor_loop_lag(lag_samples, lag_interval, stop))
+    gc.collect()
+    rss_before = _current_rss_kb()
+    started = time.perf_counter()
+    try:
+        with scripted_agents(root_agent, scripts or DEFAULT_SCRIPTS), \
+                misttrack_endpoint(base_url), \
+                isolated_session_state(), \
+                isolated_shared_cache() as shared_cache_enabled:
+            await asyncio.gather(*(bounded(i) for i in range(sessions)))
+    finally:
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await monitor
+        await api_runner.cleanup()
+    gc.collect()
+    rss_after = _current_rss_kb()
+    rss_growth = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+
+    completed = len(session_latencies)
+    return {
+        "sessions": sessions,
+        "completed": completed,
+        "failed": len(errors),
+        "errors": sorted(set(errors))[:5],
+        "elapsed_s": round(elapsed, 3),
+        "sessions_per_sec": round(completed / elapsed, 2) if elapsed else 0.0,
+        "session_latency": _summarize(session_latencies),
+        "tool_latency": {name: _summarize(samples) for name, samples in sorted(tool_latencies.items())},
+        "loop_lag": _summarize(lag_samples),
+        "rss_before_kb": rss_before,
+        "rss_after_kb": rss_after,
+        "memory_per_session_kb": round(rss_growth / sessions, 2) if rss_growth is not None and sessions else None,
+        "shared_cache": shared_cache_enabled,
+        "api_requests": dict(sorted(fake_api.request_counts.items())),
+    }
@@ -0,0 +1,129 @@
+from typing import Dict, Any, List, AsyncGenerator, Optional
+import json
+import re
+
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.genai import types
+
+# 每個腳本步驟為工具調用 {"call": 工具名, "args": {...}} 或最終回覆 {"text": "..."}；
+# 字符串參數中的 {address} 會替換為用戶消息中的地址
+ScriptStep = Dict[str, Any]
+
+# 一次完整調查：獲取交易、補充風險與標籤、渲染圖表、回到根代理總結
+DEFAULT_SCRIPTS: Dict[str, List[ScriptStep]] = {
+    "investigator_agent": [
+        {"call": "transfer_to_agent", "args": {"agent_name": "misttrack_crypto_agent"}},
+        {"text": "地址 {address} 的調查報告已完成。"},
+    ],
+    "misttrack_crypto_agent": [
+        {"call": "get_transactions_and_store", "args": {"coin": "ETH", "address": "{address}"}},
+        {"call": "get_risk_score_cached", "args": {"coin": "ETH", "address": "{address}"}},
+        {"call": "get_address_labels_cached", "args": {"coin": "ETH", "address": "{address}"}},
+        {"call": "transfer_to_agent", "args": {"agent_name": "graph_agent"}},
+    ],
+    "graph_agent": [
+        {"call": "render_stored_tx_graph", "args": {}},
+        {"call": "transfer_to_agent", "args": {"agent_name": "investigator_agent"}},
+    ],
+}
+
+_ADDRESS_PATTERN = re.compile(r"0x[0-9a-fA-F]+")
+
+def _find_address(contents: List[types.Content]) -> str:
+    """從用戶消息中找出第一個地址。"""
+    for content in contents:
+        if content.role != "user":
+            continue
+        for part in content.parts or []:
+            if part.text:
+                match = _ADDRESS_PATTERN.search(part.text)
+                if match:
+                    return match.group(0)
+    return ""
+
+def _format_args(args: Dict[str, Any], address: str) -> Dict[str, Any]:
+    return {
+        key: value.format(address=address) if isinstance(value, str) else value
+        for key, value in args.items()
+    }
+
+class ScriptedLlm(BaseLlm):
+    """
+    按預先錄製的步驟回覆的確定性模型，用於壓力測試，不會調用 Gemini。
+    每個代理使用獨立的實例；當前步驟由請求中已完成的工具響應數量決定，
+    因此同一實例可以安全地被多個並發會話共用。
+    """
+    script: List[ScriptStep]
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        # 其他代理的事件會被轉為文本上下文，剩下的工具響應都屬於本代理
+        step_index = sum(
+            1
+            for content in llm_request.contents
+            for part in content.parts or []
+            if part.function_response
+        )
+        # 超出腳本長度時重複最後一步
+        step = self.script[min(step_index, len(self.script) - 1)]
+        address = _find_address(llm_request.contents)
+
+        if "call" in step:
+            part = types.Part(function_call=types.FunctionCall(
+                name=step["call"],
+                args=_format_args(step.get("args", {}), address)
+            ))
+        else:
+            part = types.Part(text=step["text"].format(address=address))
+
+        yield LlmResponse(content=types.Content(role="model", parts=[part]))
+
+def build_scripts(skip_render: bool = False, coin: Optional[str] = None) -> Dict[str, List[ScriptStep]]:
+    """
+    根據默認腳本生成一份可調整的副本。
+
+    參數:
+        skip_render: 跳過圖表渲染（未安裝 Graphviz 時使用）
+        coin: 替換工具調用中的幣種
+    """
+    scripts = {}
+    for agent_name, steps in DEFAULT_SCRIPTS.items():
+        scripts[agent_name] = []
+        for step in steps:
+            if skip_render and step.get("call") == "render_stored_tx_graph":
+                continue
+            step = {**step, "args": dict(step["args"])} if "call" in step else dict(step)
+            if coin and "coin" in step.get("args", {}):
+                step["args"]["coin"] = coin
+            scripts[agent_name].append(step)
+    return scripts
+
+def load_scripts(path: str, base: Optional[Dict[str, List[ScriptStep]]] = None) -> Dict[str, List[ScriptStep]]:
+    """
+    從 JSON 文件讀取錄製的工具調用序列，格式為 {代理名稱: [步驟, ...]}。
+    文件中的代理腳本覆蓋 base 中的同名腳本，未出現的代理沿用 base。
+
+    參數:
+        path: JSON 文件路徑
+        base: 基礎腳本，默認使用 DEFAULT_SCRIPTS
+
+    返回:
+        合併後的腳本
+
+    異常:
+        ValueError: 文件格式不正確
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        loaded = json.load(f)
+    if not isinstance(loaded, dict):
+        raise ValueError("腳本文件必須是代理名稱到步驟列表的映射")
+    for agent_name, steps in loaded.items():
+        if not isinstance(steps, list) or not steps:
+            raise ValueError(f"代理 {agent_name} 的腳本必須是非空列表")
+        for step in steps:
+            if not isinstance(step, dict) or ("call" in step) == ("text" in step):
+                raise ValueError(f"代理 {agent_name} 的步驟必須且只能包含 call 或 text: {step}")
+            if not isinstance(step.get("args", {}), dict):
+                raise ValueError(f"代理 {agent_name} 的步驟參數必須是對象: {step}")
+    return {**(base if base is not None else DEFAULT_SCRIPTS), **loaded}
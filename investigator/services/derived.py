@@ -0,0 +1,46 @@
+from typing import Dict, Any, Callable, Set, Tuple
+
+class DerivedCache:
+    """
+    緩存由源數據計算出的派生結果（轉換後的邊緣、統計、渲染圖像等）。
+    每個結果記錄計算時各源數據的版本，版本變化時重新計算；
+    源數據被移除時，依賴它的結果一併失效。
+    """
+    def __init__(self):
+        self._entries: Dict[str, Tuple[Dict[str, int], Any]] = {}
+        self._dependents: Dict[str, Set[str]] = {}
+
+    def get_or_compute(self, name: str, sources: Dict[str, int], compute: Callable[[], Any]) -> Any:
+        """
+        返回派生結果，源數據版本與緩存時一致則直接復用。
+
+        參數:
+            name: 派生結果的唯一名稱
+            sources: 源數據鍵到當前版本的映射
+            compute: 計算派生結果的函數
+
+        返回:
+            派生結果
+        """
+        cached = self._entries.get(name)
+        if cached and cached[0] == sources:
+            return cached[1]
+
+        value = compute()
+        self._entries[name] = (dict(sources), value)
+        for source in sources:
+            self._dependents.setdefault(source, set()).add(name)
+        return value
+
+    def invalidate_source(self, source: str) -> None:
+        """移除所有依賴指定源數據的派生結果。"""
+        for name in self._dependents.pop(source, set()):
+            self._entries.pop(name, None)
+
+    def clear(self) -> None:
+        """清除所有派生結果。"""
+        self._entries = {}
+        self._dependents = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,4 +1,4 @@
-from typing import List, Dict, Union
+from typing import List, Dict, Union, Any
 import base64
 from graphviz import Digraph
 
@@ -35,4 +35,30 @@ def render_tx_graph(
     base64_str = base64.b64encode(png_bytes).decode('utf-8')
     
     # 返回可在Markdown中顯示的格式
-    return f"![交易圖](data:image/png;base64,{base64_str})"
\ No newline at end of file
+    return f"![交易圖](data:image/png;base64,{base64_str})"
+
+def summarize_tx_edges(edges: List[Dict[str, str]]) -> Dict[str, Any]:
+    """
+    計算交易邊緣的匯總統計。
+
+    參數:
+      edges: 與 render_tx_graph 相同格式的邊緣列表
+
+    返回:
+      包含 edge_count、address_count、total_value 的字典。
+    """
+    addresses = set()
+    total_value = 0.0
+    for e in edges:
+        addresses.add(e["from"])
+        addresses.add(e["to"])
+        try:
+            total_value += float(e["value"])
+        except (TypeError, ValueError):
+            pass
+
+    return {
+        "edge_count": len(edges),
+        "address_count": len(addresses),
+        "total_value": total_value
+    }
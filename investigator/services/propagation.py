@@ -0,0 +1,250 @@
+from typing import Dict, Any, List, Literal, Optional, Tuple
+import numpy as np
+
+from investigator.services.state import SessionState
+
+PropagationMethod = Literal["haircut", "pagerank"]
+PROPAGATION_METHODS = ("haircut", "pagerank")
+
+# 未緩存風險評分的地址按標籤推斷種子風險值：標籤（不區分大小寫）包含關鍵詞即匹配，
+# 多個標籤匹配時取最高值；有緩存的風險評分時以評分為準
+LABEL_RISK_SCORES: Dict[str, float] = {
+    "phishing": 1.0,
+    "scam": 1.0,
+    "hack": 1.0,
+    "exploit": 1.0,
+    "ransomware": 1.0,
+    "sanction": 1.0,
+    "darknet": 0.9,
+    "mixer": 0.8,
+    "tornado": 0.8,
+    "gambling": 0.5,
+}
+
+def _parse_value(value: Any) -> float:
+    """解析交易價值字符串，無法解析時返回 0。"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+def dedupe_edges(edges: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """
+    去除重複的交易邊緣。同一筆交易可能出現在多個緩存的調查結果中
+    （all 與 in/out 查詢、重疊的分頁、雙方地址都被調查），重複計入會扭曲按價值的歸一化。
+    有交易哈希時按哈希去重，否則按 (from, to, value, ts) 去重。
+    """
+    seen = set()
+    unique = []
+    for e in edges:
+        key = e.get("hash") or (e["from"], e["to"], str(e.get("value")), str(e.get("ts")))
+        if key not in seen:
+            seen.add(key)
+            unique.append(e)
+    return unique
+
+def _build_graph(
+    edges: List[Dict[str, str]],
+    extra_addresses: List[str]
+) -> Tuple[Dict[str, int], np.ndarray, np.ndarray, np.ndarray]:
+    """
+    將邊緣列表轉換為稀疏鄰接矩陣的 COO 表示。
+
+    參數:
+        edges: 邊緣列表
+        extra_addresses: 需要包含在圖中的額外地址（例如沒有交易的種子地址）
+
+    返回:
+        (地址到索引的映射, 起點索引, 終點索引, 交易價值)
+    """
+    sources = [e["from"] for e in edges]
+    targets = [e["to"] for e in edges]
+    addresses = list(dict.fromkeys(sources + targets + list(extra_addresses)))
+    index = dict(zip(addresses, range(len(addresses))))
+    src = np.fromiter(map(index.__getitem__, sources), dtype=np.int64, count=len(edges))
+    dst = np.fromiter(map(index.__getitem__, targets), dtype=np.int64, count=len(edges))
+
+    raw_values = [e.get("value", "0") for e in edges]
+    try:
+        values = np.array(list(map(float, raw_values)), dtype=np.float64)
+    except (TypeError, ValueError):
+        values = np.array(list(map(_parse_value, raw_values)), dtype=np.float64)
+    # 零價值或無法解析的邊緣保留極小權重，使結構上的連接仍可傳播
+    values = np.where(np.isfinite(values) & (values > 0), values, 1e-12)
+    return index, src, dst, values
+
+def _normalize(index: np.ndarray, values: np.ndarray, n: int) -> np.ndarray:
+    """按節點對邊緣權重歸一化（每個節點相關邊緣的權重之和為 1）。"""
+    totals = np.bincount(index, weights=values, minlength=n)
+    return values / totals[index]
+
+def _haircut(src, dst, values, seed, n, max_iter, tol) -> np.ndarray:
+    # Haircut 模型：接收方的污染比例等於其流入資金按價值加權的平均污染比例，
+    # 種子地址至少保持其自身風險值
+    weights = _normalize(dst, values, n)
+    taint = seed.copy()
+    for _ in range(max_iter):
+        inflow = np.bincount(dst, weights=weights * taint[src], minlength=n)
+        updated = np.maximum(seed, inflow)
+        if np.abs(updated - taint).sum() < tol:
+            return updated
+        taint = updated
+    return taint
+
+def _pagerank(src, dst, values, seed, n, damping, max_iter, tol) -> np.ndarray:
+    # 個性化 PageRank：沿流出資金按價值比例傳播，重啟分佈為種子風險值
+    weights = _normalize(src, values, n)
+    restart = seed / seed.sum()
+    dangling = np.bincount(src, minlength=n) == 0
+    rank = restart.copy()
+    for _ in range(max_iter):
+        flow = np.bincount(dst, weights=weights * rank[src], minlength=n)
+        # 沒有流出邊緣的節點把分數交回種子
+        flow += rank[dangling].sum() * restart
+        updated = (1 - damping) * restart + damping * flow
+        if np.abs(updated - rank).sum() < tol:
+            return updated
+        rank = updated
+    return rank
+
+def propagate_risk(
+    edges: List[Dict[str, str]],
+    seeds: Dict[str, float],
+    method: PropagationMethod = "haircut",
+    damping: float = 0.85,
+    max_iter: int = 100,
+    tol: float = 1e-9
+) -> List[Tuple[str, float]]:
+    """
+    從種子地址沿交易圖傳播風險。
+
+    參數:
+        edges: 圖形代理格式的邊緣列表（from、to、value、ts）
+        seeds: 種子地址到初始風險值（0 到 1）的映射
+        method: "haircut" 按價值比例計算污染比例；"pagerank" 為個性化 PageRank
+        damping: PageRank 阻尼係數
+        max_iter: 最大迭代次數
+        tol: 收斂閾值
+
+    返回:
+        按暴露度從高到低排序的 (地址, 暴露度) 列表，不含暴露度為 0 的地址；
+        不在交易圖中的種子地址作為孤立節點參與計算
+
+    異常:
+        ValueError: 不支持的傳播方法
+    """
+    if method not in PROPAGATION_METHODS:
+        raise ValueError(f"不支持的傳播方法: {method}")
+
+    seeds = {address: score for address, score in seeds.items() if score > 0}
+    if not seeds:
+        return []
+
+    index, src, dst, values = _build_graph(edges, list(seeds))
+    addresses = list(index)
+    n = len(addresses)
+
+    seed = np.zeros(n, dtype=np.float64)
+    for address, score in seeds.items():
+        seed[index[address]] = score
+
+    if method == "pagerank":
+        exposure = _pagerank(src, dst, values, seed, n, damping, max_iter, tol)
+    else:
+        exposure = _haircut(src, dst, values, seed, n, max_iter, tol)
+
+    order = np.argsort(-exposure, kind="stable")
+    order = order[exposure[order] > 0]
+    return [(addresses[i], float(exposure[i])) for i in order]
+
+def _extract_risk_score(risk_data: Dict[str, Any]) -> float:
+    """從 MistTrack 風險評分響應中取出 0 到 1 的風險值。"""
+    try:
+        return min(max(float(risk_data.get("data", {}).get("score", 0)) / 100.0, 0.0), 1.0)
+    except (AttributeError, TypeError, ValueError):
+        return 0.0
+
+def _extract_labels(label_data: Dict[str, Any]) -> List[str]:
+    """從 MistTrack 地址標籤響應中取出標籤列表。"""
+    data = label_data.get("data", {})
+    if not isinstance(data, dict):
+        return []
+    return list(data.get("label_list", []))
+
+def label_risk_score(labels: List[str]) -> float:
+    """按 LABEL_RISK_SCORES 計算一組標籤對應的種子風險值，沒有匹配時返回 0。"""
+    score = 0.0
+    for label in labels:
+        lowered = str(label).lower()
+        for keyword, keyword_score in LABEL_RISK_SCORES.items():
+            if keyword in lowered:
+                score = max(score, keyword_score)
+    return score
+
+def propagate_cached_risk(
+    state: SessionState,
+    coin: str,
+    seed_addresses: Optional[List[str]] = None,
+    method: PropagationMethod = "haircut",
+    top_k: int = 20
+) -> Dict[str, Any]:
+    """
+    使用會話緩存中的交易、風險評分和標籤進行風險傳播，不調用任何 API。
+    已緩存風險評分的地址以評分作為種子；沒有評分但有高風險標籤的地址按 LABEL_RISK_SCORES 作為種子。
+
+    參數:
+        state: SessionState 實例
+        coin: 幣種類型
+        seed_addresses: 額外的種子地址，未緩存風險評分時按風險值 1 處理
+        method: 傳播方法
+        top_k: 返回暴露度最高的地址數量
+
+    返回:
+        包含排序後暴露度及地址風險信息的字典
+
+    異常:
+        ValueError: 不支持的傳播方法
+    """
+    if method not in PROPAGATION_METHODS:
+        raise ValueError(f"不支持的傳播方法: {method}")
+
+    edges = []
+    for address, data_type, _ in state.iter_cached_address_data(coin, "tx_investigation_"):
+        edges.extend(state.get_tx_graph_edges(coin, address, data_type))
+    edges = dedupe_edges(edges)
+
+    risk_scores = {
+        address: _extract_risk_score(data)
+        for address, _, data in state.iter_cached_address_data(coin, "risk_score")
+    }
+    labels = {
+        address: _extract_labels(data)
+        for address, _, data in state.iter_cached_address_data(coin, "labels")
+    }
+
+    seeds = {address: score for address, score in risk_scores.items() if score > 0}
+    for address, address_labels in labels.items():
+        if address not in risk_scores:
+            score = label_risk_score(address_labels)
+            if score > 0:
+                seeds[address] = score
+    for address in seed_addresses or []:
+        # 已緩存的評分（包括 0）優先；只有未緩存評分時才按 1 處理
+        seeds[address] = risk_scores[address] if address in risk_scores else 1.0
+
+    ranked = propagate_risk(edges, seeds, method=method)
+    return {
+        "method": method,
+        "edge_count": len(edges),
+        "seed_count": sum(1 for score in seeds.values() if score > 0),
+        "ranked": [
+            {
+                "address": address,
+                "exposure": round(exposure, 6),
+                "is_seed": seeds.get(address, 0) > 0,
+                "risk_score": risk_scores.get(address),
+                "labels": labels.get(address, [])
+            }
+            for address, exposure in ranked[:top_k]
+        ]
+    }
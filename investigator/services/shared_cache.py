@@ -0,0 +1,228 @@
+from typing import Dict, Any, Optional, AsyncIterator
+from contextlib import asynccontextmanager
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # 非 POSIX 系統沒有 fcntl；只有啟用共享緩存時才需要，不應影響整個包的導入
+    fcntl = None
+
+# 設置 SHARED_CACHE_DIR 後，同一台機器上的所有工作進程共用此目錄作為 MistTrack 響應緩存
+SHARED_CACHE_DIR_ENV = "SHARED_CACHE_DIR"
+SHARED_CACHE_TTL_ENV = "SHARED_CACHE_TTL"
+SHARED_CACHE_MAX_ENTRIES_ENV = "SHARED_CACHE_MAX_ENTRIES"
+
+# 清理後保留的最多條目數，超出時按修改時間刪除最舊的條目
+DEFAULT_MAX_ENTRIES = 10000
+
+# 鎖文件數量固定，鍵按哈希分配到鎖上，避免每個鍵留下一個鎖文件
+LOCK_STRIPES = 256
+# 等待其他進程釋放鎖時的輪詢間隔（秒），逐步加長
+LOCK_POLL_MIN = 0.005
+LOCK_POLL_MAX = 0.1
+# 清理過期條目和殘留臨時文件的間隔（秒）
+SWEEP_INTERVAL = 300
+# 超過此時間的臨時文件視為寫入中途崩潰留下的殘留
+STALE_TMP_AGE = 60
+
+class SharedCache:
+    """
+    跨進程共享的本地文件緩存。
+    每個條目以 JSON 文件存儲，寫入時先寫臨時文件再原子替換；
+    通過固定數量的 flock 文件鎖實現跨進程的 single-flight，不依賴任何外部服務。
+    寫入時定期清理過期條目、超出 max_entries 的最舊條目和殘留的臨時文件，
+    因此即使不設置 TTL，每次清理後目錄中的條目數也不超過 max_entries。
+    """
+    def __init__(self, directory: str, ttl: Optional[float] = None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        參數:
+            directory: 緩存目錄，所有共享此緩存的進程必須使用相同路徑
+            ttl: 條目有效秒數，None 表示不按時間過期（仍受 max_entries 限制）
+            max_entries: 清理後保留的最多條目數
+
+        異常:
+            RuntimeError: 當前系統不支持 fcntl 文件鎖
+        """
+        if fcntl is None:
+            raise RuntimeError("共享緩存需要 POSIX 文件鎖（fcntl），當前系統不支持")
+        self._dir = directory
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._last_sweep = time.time()
+        os.makedirs(self._dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> Optional["SharedCache"]:
+        """根據環境變量創建共享緩存，未設置 SHARED_CACHE_DIR 時返回 None。"""
+        directory = os.environ.get(SHARED_CACHE_DIR_ENV)
+        if not directory:
+            return None
+        ttl = os.environ.get(SHARED_CACHE_TTL_ENV)
+        max_entries = os.environ.get(SHARED_CACHE_MAX_ENTRIES_ENV)
+        return cls(
+            directory,
+            float(ttl) if ttl else None,
+            int(max_entries) if max_entries else DEFAULT_MAX_ENTRIES
+        )
+
+    @property
+    def ttl(self) -> Optional[float]:
+        """條目有效秒數，None 表示永不過期。"""
+        return self._ttl
+
+    def is_expired(self, entry: Dict[str, Any]) -> bool:
+        """判斷條目是否已超過 TTL。"""
+        return self._ttl is not None and time.time() - entry.get("timestamp", 0) > self._ttl
+
+    def _digest(self, key: str) -> str:
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self._dir, f"{self._digest(key)}{suffix}")
+
+    def _lock_path(self, key: str) -> str:
+        return self._stripe_path(self._digest(key))
+
+    def _stripe_path(self, digest: str) -> str:
+        stripe = int(digest[:8], 16) % LOCK_STRIPES
+        return os.path.join(self._dir, f"stripe_{stripe:03d}.lock")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        讀取緩存條目。
+
+        返回:
+            包含 'data' 和 'timestamp' 的條目，不存在或已過期則返回 None
+        """
+        path = self._path(key, ".json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # 過期文件留給 sweep 在持有鎖時刪除；此處不持鎖，直接刪除可能誤刪其他進程剛寫入的新條目
+        if self.is_expired(entry):
+            return None
+        return entry
+
+    def set(self, key: str, data: Dict[str, Any], timestamp: Optional[float] = None) -> None:
+        """原子地寫入緩存條目，讀取方不會看到寫了一半的文件。"""
+        entry = {
+            "data": data,
+            "timestamp": timestamp if timestamp is not None else time.time()
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self._dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key, ".json"))
+        except:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        if time.time() - self._last_sweep > SWEEP_INTERVAL:
+            self.sweep()
+
+    def delete(self, key: str) -> None:
+        """刪除緩存條目。"""
+        try:
+            os.remove(self._path(key, ".json"))
+        except OSError:
+            pass
+
+    def clear(self) -> None:
+        """
+        刪除所有緩存條目和臨時文件（會影響所有共享此目錄的進程）。
+        鎖文件可能正被其他進程持有，刪除會破壞互斥，因此保留；其數量固定為 LOCK_STRIPES。
+        """
+        for name in os.listdir(self._dir):
+            if name.endswith(".json") or name.endswith(".tmp"):
+                try:
+                    os.remove(os.path.join(self._dir, name))
+                except OSError:
+                    pass
+
+    def sweep(self) -> None:
+        """
+        刪除已過期的條目、超出 max_entries 的最舊條目，以及寫入中途殘留的臨時文件。
+        條目寫入時間與文件修改時間一致，因此按修改時間判斷，無需讀取文件內容。
+        條目只在持有對應的鎖且文件未被改寫時刪除，不會誤刪 single_flight 內剛寫入的新條目；
+        鎖正被佔用的條目留待下次清理。
+        """
+        self._last_sweep = time.time()
+        now = self._last_sweep
+        entries = []
+        for name in os.listdir(self._dir):
+            path = os.path.join(self._dir, name)
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                continue
+            if name.endswith(".tmp"):
+                if now - mtime > STALE_TMP_AGE:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            elif name.endswith(".json"):
+                entries.append((mtime, name))
+
+        entries.sort()
+        overflow = max(len(entries) - self._max_entries, 0)
+        for position, (mtime, name) in enumerate(entries):
+            expired = self._ttl is not None and now - mtime > self._ttl
+            if position < overflow or expired:
+                self._remove_if_unchanged(name, mtime)
+
+    def _remove_if_unchanged(self, name: str, mtime: float) -> None:
+        """在不阻塞的情況下獲取條目的鎖，文件修改時間未變時才刪除。"""
+        path = os.path.join(self._dir, name)
+        fd = os.open(self._stripe_path(name[:-len(".json")]), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            try:
+                if os.stat(path).st_mtime == mtime:
+                    os.remove(path)
+            except OSError:
+                pass
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    @asynccontextmanager
+    async def single_flight(self, key: str) -> AsyncIterator[None]:
+        """
+        獲取指定鍵的跨進程排他鎖。
+        持有鎖期間，其他進程對同一鍵的 single_flight 會等待，
+        因此獲得鎖後應先重新檢查緩存，再決定是否調用 API。
+        鍵按哈希共用 LOCK_STRIPES 個鎖文件，不同鍵偶爾會互相等待，但不會死鎖。
+        """
+        fd = os.open(self._lock_path(key), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            # 以非阻塞方式輪詢，不佔用線程池，且等待期間可以被取消
+            delay = LOCK_POLL_MIN
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, LOCK_POLL_MAX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
@@ -0,0 +1,211 @@
+from typing import Dict, Any, List, Optional
+import json
+import os
+import re
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+# 快照是一個目錄，包含三個 Arrow IPC 文件，讀取時通過內存映射加載
+SNAPSHOT_FORMAT_VERSION = "1"
+
+# 代理工具只能按名稱讀寫此目錄下的快照
+SNAPSHOT_DIR_ENV = "SNAPSHOT_DIR"
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.path.expanduser("~"), ".investigator_snapshots")
+_SNAPSHOT_NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,127}$")
+CACHE_FILE = "cache.arrow"
+EDGES_FILE = "edges.arrow"
+GRAPHS_FILE = "graphs.arrow"
+
+# 地址和交易哈希不含換行符，以換行分隔存儲比 JSON 解析快得多
+LIST_METADATA_KEYS = ("addresses_investigated", "transactions_analyzed")
+
+CACHE_SCHEMA = pa.schema([
+    ("cache_key", pa.string()),
+    ("data_type", pa.string()),  # 交易緩存條目沒有數據類型，為 null
+    ("timestamp", pa.float64()),
+    ("payload", pa.binary()),  # UTF-8 JSON
+])
+
+EDGES_SCHEMA = pa.schema([
+    ("from", pa.dictionary(pa.int32(), pa.string())),
+    ("to", pa.dictionary(pa.int32(), pa.string())),
+    ("value", pa.string()),
+    ("ts", pa.string()),
+    ("hash", pa.string()),  # 沒有交易哈希的邊緣為 null
+])
+
+GRAPHS_SCHEMA = pa.schema([
+    ("file_id", pa.string()),
+    ("png", pa.binary()),
+])
+
+def resolve_snapshot_path(name: str) -> str:
+    """
+    將快照名稱解析為快照根目錄（SNAPSHOT_DIR 環境變量）下的路徑。
+
+    參數:
+        name: 快照名稱，只能包含字母、數字、點、下劃線和連字符，且不能以點開頭
+
+    返回:
+        快照目錄路徑
+
+    異常:
+        ValueError: 名稱不合法
+    """
+    if not _SNAPSHOT_NAME_PATTERN.match(name):
+        raise ValueError(f"不合法的快照名稱: {name}")
+    root = os.path.abspath(os.environ.get(SNAPSHOT_DIR_ENV) or DEFAULT_SNAPSHOT_DIR)
+    return os.path.join(root, name)
+
+def _write_table(path: str, table: pa.Table, compression: Optional[str]) -> None:
+    options = ipc.IpcWriteOptions(compression=compression)
+    with pa.OSFile(path, "wb") as sink:
+        with ipc.new_file(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+
+def _read_table(path: str) -> pa.Table:
+    # 未壓縮的文件可直接引用映射內存，無需複製
+    with pa.memory_map(path, "r") as source:
+        return ipc.open_file(source).read_all()
+
+def _dictionary_to_pylist(column: pa.ChunkedArray) -> List[str]:
+    # 直接按索引查字典比 to_pylist 快得多，且相同地址共用同一字符串對象
+    values = []
+    for chunk in column.chunks:
+        dictionary = chunk.dictionary.to_pylist()
+        values.extend(dictionary[i] for i in chunk.indices.to_numpy(zero_copy_only=False))
+    return values
+
+def decode_payload(payload: Any) -> Dict[str, Any]:
+    """解碼快照中的緩存數據（bytes 或映射內存中的 Arrow Buffer）。"""
+    return json.loads(bytes(payload))
+
+def _encode_entry(entry: Dict[str, Any]) -> bytes:
+    # 尚未解碼的條目直接寫回原始數據
+    if "payload" in entry:
+        return bytes(entry["payload"])
+    return json.dumps(entry["data"], ensure_ascii=False).encode("utf-8")
+
+def write_snapshot(
+    path: str,
+    cache_entries: List[Dict[str, Any]],
+    edges: List[Dict[str, str]],
+    graphs: Dict[str, bytes],
+    metadata: Dict[str, Any],
+    compression: Optional[str] = None
+) -> None:
+    """
+    將調查數據寫入快照目錄。
+
+    參數:
+        path: 快照目錄
+        cache_entries: 緩存條目列表，每項包含 cache_key、data_type、timestamp，
+            以及 data 或尚未解碼的 payload
+        edges: 圖形代理格式的邊緣列表；各字段以字符串存儲，數值時間戳等會被轉為字符串
+        graphs: 圖像文件 ID 到 PNG 數據的映射
+        metadata: 其他可 JSON 序列化的會話信息；其中 addresses_investigated 和
+            transactions_analyzed 列表可能很大，單獨以換行分隔存儲
+        compression: 可選的 "zstd" 或 "lz4"；壓縮後體積更小，但加載時需要解壓而不能零拷貝映射
+    """
+    os.makedirs(path, exist_ok=True)
+
+    cache_table = pa.table({
+        "cache_key": [e["cache_key"] for e in cache_entries],
+        "data_type": [e["data_type"] for e in cache_entries],
+        "timestamp": [e["timestamp"] for e in cache_entries],
+        "payload": [_encode_entry(e) for e in cache_entries],
+    }, schema=CACHE_SCHEMA).replace_schema_metadata({
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "session": json.dumps(
+            {k: v for k, v in metadata.items() if k not in LIST_METADATA_KEYS},
+            ensure_ascii=False
+        ),
+        **{k: "\n".join(metadata.get(k, [])) for k in LIST_METADATA_KEYS},
+    })
+    _write_table(os.path.join(path, CACHE_FILE), cache_table, compression)
+
+    edges_table = pa.table({
+        "from": pa.array([str(e["from"]) for e in edges], pa.string()).dictionary_encode(),
+        "to": pa.array([str(e["to"]) for e in edges], pa.string()).dictionary_encode(),
+        "value": pa.array([str(e["value"]) for e in edges], pa.string()),
+        "ts": pa.array([str(e["ts"]) for e in edges], pa.string()),
+        "hash": pa.array([e.get("hash") for e in edges], pa.string()),
+    }, schema=EDGES_SCHEMA)
+    _write_table(os.path.join(path, EDGES_FILE), edges_table, compression)
+
+    graphs_table = pa.table({
+        "file_id": list(graphs.keys()),
+        "png": list(graphs.values()),
+    }, schema=GRAPHS_SCHEMA)
+    _write_table(os.path.join(path, GRAPHS_FILE), graphs_table, compression)
+
+def read_snapshot(path: str) -> Dict[str, Any]:
+    """
+    讀取快照目錄。
+
+    返回:
+        包含 cache_entries、edges、graphs、metadata 的字典，結構與 write_snapshot 的參數相同；
+        緩存條目的數據以未解碼的 payload 返回，指向映射內存，按需用 decode_payload 解碼
+
+    異常:
+        ValueError: 快照格式版本不受支持
+    """
+    cache_table = _read_table(os.path.join(path, CACHE_FILE))
+    schema_metadata = cache_table.schema.metadata or {}
+    version = schema_metadata.get(b"format_version", b"").decode("utf-8")
+    if version != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"不支持的快照格式版本: {version or '未知'}")
+
+    payloads = [
+        payload.as_buffer()
+        for chunk in cache_table.column("payload").chunks
+        for payload in chunk
+    ]
+    cache_entries = [
+        {
+            "cache_key": cache_key,
+            "data_type": data_type,
+            "timestamp": timestamp,
+            "payload": payload,
+        }
+        for cache_key, data_type, timestamp, payload in zip(
+            cache_table.column("cache_key").to_pylist(),
+            cache_table.column("data_type").to_pylist(),
+            cache_table.column("timestamp").to_pylist(),
+            payloads,
+        )
+    ]
+
+    edges_table = _read_table(os.path.join(path, EDGES_FILE))
+    columns = [
+        _dictionary_to_pylist(edges_table.column("from")),
+        _dictionary_to_pylist(edges_table.column("to")),
+        edges_table.column("value").to_pylist(),
+        edges_table.column("ts").to_pylist(),
+        edges_table.column("hash").to_pylist(),
+    ]
+    edges = [
+        {"from": sender, "to": receiver, "value": value, "ts": ts, "hash": tx_hash}
+        if tx_hash is not None else
+        {"from": sender, "to": receiver, "value": value, "ts": ts}
+        for sender, receiver, value, ts, tx_hash in zip(*columns)
+    ]
+
+    metadata = json.loads(schema_metadata.get(b"session", b"{}"))
+    for key in LIST_METADATA_KEYS:
+        joined = schema_metadata.get(key.encode("utf-8"), b"").decode("utf-8")
+        metadata[key] = joined.split("\n") if joined else []
+
+    graphs_table = _read_table(os.path.join(path, GRAPHS_FILE))
+    graphs = dict(zip(
+        graphs_table.column("file_id").to_pylist(),
+        graphs_table.column("png").to_pylist(),
+    ))
+
+    return {
+        "cache_entries": cache_entries,
+        "edges": edges,
+        "graphs": graphs,
+        "metadata": metadata,
+    }
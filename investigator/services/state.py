@@ -1,15 +1,22 @@
-from typing import Dict, Any, List, Optional, Set
+from typing import Dict, Any, List, Optional, Set, AsyncIterator, Iterator, Tuple, Callable
+from contextlib import asynccontextmanager
+import asyncio
 import time
 import os
 import tempfile
 import uuid
 
+from investigator.services.shared_cache import SharedCache
+from investigator.services.derived import DerivedCache
+from investigator.services.graph import summarize_tx_edges, render_tx_graph
+from investigator.services.snapshot import write_snapshot, read_snapshot, decode_payload
+
 class SessionState:
     """
     管理代理之間的會話狀態。
     允許跨代理邊界存儲和檢索數據，並緩存所有調查相關數據。
     """
-    def __init__(self):
+    def __init__(self, shared_cache: Optional[SharedCache] = None):
         self._state: Dict[str, Any] = {}
         self._investigation_cache: Dict[str, Dict[str, Any]] = {}
         self._addresses_investigated: Set[str] = set()
@@ -19,11 +26,22 @@ class SessionState:
         # 建立臨時文件目錄用於存儲圖像
         self._temp_dir = tempfile.mkdtemp(prefix="tx_graphs_")
         self._graph_files: Dict[str, str] = {}
+        
+        # 可選的跨進程共享緩存，以及進程內的 single-flight 鎖
+        self._shared_cache = shared_cache
+        self._flight_locks: Dict[str, List[Any]] = {}
+        
+        # 源數據版本號，以及依賴這些版本的派生結果
+        self._versions: Dict[str, int] = {}
+        self._derived = DerivedCache()
+        # 當前 tx_data 來自哪個緩存條目，None 表示不是來自緩存（例如帶時間過濾的查詢）
+        self._tx_data_source: Optional[str] = None
     
     def set(self, key: str, value: Any) -> None:
         """在會話狀態中設置值。"""
         self._state[key] = value
         self._last_updated[key] = time.time()
+        self._touch(f"state:{key}")
     
     def get(self, key: str, default: Any = None) -> Any:
         """從會話狀態中獲取值。"""
@@ -36,6 +54,10 @@ class SessionState:
         self._addresses_investigated = set()
         self._transactions_analyzed = set()
         self._last_updated = {}
+        self._versions = {}
+        self._derived.clear()
+        self._tx_data_source = None
+        # 共享緩存屬於所有工作進程，這裡只清除本進程的狀態
         
         # 清除圖像文件
         for filepath in self._graph_files.values():
@@ -53,11 +75,20 @@ class SessionState:
         """
         return self.get('tx_data', [])
     
-    def set_tx_data(self, tx_data: List[Dict[str, str]]) -> None:
+    def set_tx_data(self, tx_data: List[Dict[str, str]], source: Optional[str] = None) -> None:
         """
         以圖形渲染所需的格式存儲交易數據。
+        
+        參數:
+            tx_data: 邊緣列表
+            source: 邊緣所來自的緩存條目 "{coin}_{address}:{data_type}"，
+                渲染結果按此條目緩存；不是來自緩存的數據傳入 None
         """
+        # 重複存入同一份（已緩存的）邊緣時不視為數據變化，避免圖像重新渲染
+        if tx_data is self._state.get('tx_data') and source == self._tx_data_source:
+            return
         self.set('tx_data', tx_data)
+        self._tx_data_source = source
     
     # 緩存相關方法
     
@@ -75,12 +106,17 @@ class SessionState:
         if cache_key not in self._investigation_cache:
             self._investigation_cache[cache_key] = {}
         
+        timestamp = time.time()
         self._investigation_cache[cache_key][data_type] = {
             'data': data,
-            'timestamp': time.time()
+            'timestamp': timestamp
         }
         
         self._addresses_investigated.add(address)
+        self._touch(f"{cache_key}:{data_type}")
+        
+        if self._shared_cache:
+            self._shared_cache.set(f"{cache_key}:{data_type}", data, timestamp)
     
     def get_cached_address_data(self, coin: str, address: str, data_type: str) -> Optional[Dict[str, Any]]:
         """
@@ -96,9 +132,42 @@ class SessionState:
         """
         cache_key = f"{coin}_{address}"
         if cache_key in self._investigation_cache and data_type in self._investigation_cache[cache_key]:
-            return self._investigation_cache[cache_key][data_type]['data']
+            entry = self._investigation_cache[cache_key][data_type]
+            if not self._is_expired(entry):
+                return self._entry_data(entry)
+            del self._investigation_cache[cache_key][data_type]
+            self._evict(f"{cache_key}:{data_type}")
+        
+        # 本地未命中時查詢其他工作進程寫入的共享緩存
+        if self._shared_cache:
+            entry = self._shared_cache.get(f"{cache_key}:{data_type}")
+            if entry:
+                self._investigation_cache.setdefault(cache_key, {})[data_type] = entry
+                self._addresses_investigated.add(address)
+                self._touch(f"{cache_key}:{data_type}")
+                return entry['data']
         return None
     
+    def iter_cached_address_data(self, coin: str, data_type_prefix: str) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        """
+        遍歷本地緩存中指定幣種、數據類型前綴的所有地址數據。
+        
+        參數:
+            coin: 幣種類型
+            data_type_prefix: 數據類型前綴（例如 'risk_score' 或 'tx_investigation_'）
+            
+        返回:
+            (地址, 數據類型, 緩存數據) 的迭代器
+        """
+        prefix = f"{coin}_"
+        for cache_key, entries in list(self._investigation_cache.items()):
+            if not cache_key.startswith(prefix) or cache_key.startswith(f"{coin}_tx_"):
+                continue
+            address = cache_key[len(prefix):]
+            for data_type, entry in list(entries.items()):
+                if data_type.startswith(data_type_prefix) and not self._is_expired(entry):
+                    yield address, data_type, self._entry_data(entry)
+    
     def cache_transaction_data(self, coin: str, txid: str, data: Dict[str, Any]) -> None:
         """
         緩存特定交易的數據。
@@ -109,12 +178,17 @@ class SessionState:
             data: 要緩存的數據
         """
         cache_key = f"{coin}_tx_{txid}"
+        timestamp = time.time()
         self._investigation_cache[cache_key] = {
             'data': data,
-            'timestamp': time.time()
+            'timestamp': timestamp
         }
         
         self._transactions_analyzed.add(txid)
+        self._touch(cache_key)
+        
+        if self._shared_cache:
+            self._shared_cache.set(cache_key, data, timestamp)
     
     def get_cached_transaction_data(self, coin: str, txid: str) -> Optional[Dict[str, Any]]:
         """
@@ -129,9 +203,141 @@ class SessionState:
         """
         cache_key = f"{coin}_tx_{txid}"
         if cache_key in self._investigation_cache:
-            return self._investigation_cache[cache_key]['data']
+            entry = self._investigation_cache[cache_key]
+            if not self._is_expired(entry):
+                return self._entry_data(entry)
+            del self._investigation_cache[cache_key]
+            self._evict(cache_key)
+        
+        if self._shared_cache:
+            entry = self._shared_cache.get(cache_key)
+            if entry:
+                self._investigation_cache[cache_key] = entry
+                self._transactions_analyzed.add(txid)
+                self._touch(cache_key)
+                return entry['data']
         return None
     
+    # 派生數據相關方法
+    
+    def _touch(self, source: str) -> None:
+        """源數據更新時遞增版本號，並丟棄基於舊版本的派生結果。"""
+        self._versions[source] = self._versions.get(source, 0) + 1
+        self._derived.invalidate_source(source)
+    
+    def _evict(self, source: str) -> None:
+        """源數據被移除時，丟棄依賴它的派生結果。"""
+        self._versions.pop(source, None)
+        self._derived.invalidate_source(source)
+    
+    def derive(self, name: str, sources: List[str], compute: Callable[[], Any]) -> Any:
+        """
+        獲取依賴指定源數據的派生結果，源數據未變化時直接返回緩存的結果。
+        
+        參數:
+            name: 派生結果的唯一名稱
+            sources: 源數據鍵，地址數據為 "{coin}_{address}:{data_type}"，
+                交易數據為 "{coin}_tx_{txid}"，會話狀態為 "state:{key}"
+            compute: 計算派生結果的函數
+            
+        返回:
+            派生結果
+        """
+        versions = {source: self._versions.get(source, 0) for source in sources}
+        return self._derived.get_or_compute(name, versions, compute)
+    
+    def get_tx_graph_edges(self, coin: str, address: str, data_type: str) -> List[Dict[str, str]]:
+        """
+        獲取緩存的交易調查結果轉換後的圖形邊緣，只在緩存數據變化後重新轉換。
+        
+        參數:
+            coin: 幣種類型
+            address: 區塊鏈地址
+            data_type: 交易調查的緩存數據類型
+            
+        返回:
+            圖形代理格式的邊緣列表，未緩存時返回空列表
+        """
+        source = f"{coin}_{address}:{data_type}"
+        return self.derive(
+            f"tx_edges:{source}",
+            [source],
+            lambda: self.transform_misttrack_data(self.get_cached_address_data(coin, address, data_type))
+        )
+    
+    def get_tx_graph_stats(self, coin: str, address: str, data_type: str) -> Dict[str, Any]:
+        """
+        獲取緩存的交易調查結果的匯總統計，只在緩存數據變化後重新計算。
+        
+        返回:
+            包含邊緣數、地址數和總價值的字典
+        """
+        source = f"{coin}_{address}:{data_type}"
+        return self.derive(
+            f"tx_stats:{source}",
+            [source],
+            lambda: summarize_tx_edges(self.get_tx_graph_edges(coin, address, data_type))
+        )
+    
+    def get_rendered_tx_graph(self) -> str:
+        """
+        獲取當前存儲的交易數據渲染出的圖像。
+        來自緩存條目的數據按該條目緩存渲染結果，在不同地址之間切換時不會重新渲染；
+        其他數據按會話中的 tx_data 緩存，每次存入新數據後重新渲染。
+        """
+        source = self._tx_data_source or "state:tx_data"
+        return self.derive(f"rendered_tx_graph:{source}", [source], lambda: render_tx_graph(self.get_tx_data()))
+    
+    def _entry_data(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """返回條目數據；從快照導入的條目在首次訪問時才解碼。"""
+        if 'data' not in entry:
+            entry['data'] = decode_payload(entry.pop('payload'))
+        return entry['data']
+    
+    def _is_expired(self, entry: Dict[str, Any]) -> bool:
+        """本地條目與共享緩存使用相同的 TTL；未配置共享緩存時永不過期。"""
+        return self._shared_cache is not None and self._shared_cache.is_expired(entry)
+    
+    def set_shared_cache(self, shared_cache: Optional[SharedCache]) -> Optional[SharedCache]:
+        """
+        替換跨進程共享緩存。
+        
+        參數:
+            shared_cache: 新的共享緩存，None 表示不使用
+            
+        返回:
+            原來的共享緩存
+        """
+        previous = self._shared_cache
+        self._shared_cache = shared_cache
+        return previous
+    
+    @asynccontextmanager
+    async def single_flight(self, key: str) -> AsyncIterator[None]:
+        """
+        確保同一緩存鍵同時只有一個 API 調用。
+        進程內使用 asyncio 鎖；配置共享緩存時再加上跨進程文件鎖。
+        
+        參數:
+            key: 緩存鍵
+        """
+        # 記錄每個鎖的使用者數量，無人使用時移除，避免鎖字典無限增長
+        flight = self._flight_locks.get(key)
+        if flight is None:
+            flight = self._flight_locks[key] = [asyncio.Lock(), 0]
+        flight[1] += 1
+        try:
+            async with flight[0]:
+                if self._shared_cache:
+                    async with self._shared_cache.single_flight(key):
+                        yield
+                else:
+                    yield
+        finally:
+            flight[1] -= 1
+            if flight[1] == 0:
+                del self._flight_locks[key]
+    
     def get_investigation_summary(self) -> Dict[str, Any]:
         """
         獲取當前調查的摘要信息。
@@ -183,6 +389,100 @@ class SessionState:
         """
         return self._graph_files.get(file_id)
     
+    def export_snapshot(self, path: str, compression: Optional[str] = None) -> Dict[str, Any]:
+        """
+        將當前調查導出為快照，用於恢復調查或交給其他分析師。
+        快照包含所有緩存的 API 響應、交易圖數據、風險結果和圖像文件。
+        
+        參數:
+            path: 快照目錄
+            compression: 可選的 "zstd" 或 "lz4" 壓縮
+            
+        返回:
+            導出內容的統計信息
+        """
+        cache_entries = []
+        for cache_key, entries in self._investigation_cache.items():
+            if "_tx_" in cache_key:
+                # 交易緩存條目直接保存數據，沒有數據類型層級
+                entries = {None: entries}
+            for data_type, entry in entries.items():
+                cache_entries.append({'cache_key': cache_key, 'data_type': data_type, **entry})
+        
+        graphs = {}
+        for file_id, filepath in self._graph_files.items():
+            if os.path.exists(filepath):
+                with open(filepath, 'rb') as f:
+                    graphs[file_id] = f.read()
+        
+        write_snapshot(
+            path,
+            cache_entries,
+            self.get_tx_data(),
+            graphs,
+            {
+                'addresses_investigated': sorted(self._addresses_investigated),
+                'transactions_analyzed': sorted(self._transactions_analyzed),
+                'state': {k: v for k, v in self._state.items() if k != 'tx_data'}
+            },
+            compression=compression
+        )
+        return {
+            'path': path,
+            'cache_entries': len(cache_entries),
+            'graph_edges': len(self.get_tx_data()),
+            'graph_files': len(graphs)
+        }
+    
+    def import_snapshot(self, path: str, refresh_timestamps: bool = True) -> Dict[str, Any]:
+        """
+        從快照恢復調查，替換當前會話狀態，不會調用任何 API。
+        
+        參數:
+            path: 快照目錄
+            refresh_timestamps: 是否將緩存條目的時間戳更新為導入時間。配置了 SHARED_CACHE_TTL 時，
+                保留原始時間戳會使較舊的快照在恢復後立即過期並重新調用 API，因此默認從導入時開始計算 TTL；
+                需要按原始獲取時間判斷數據新鮮度時傳入 False
+            
+        返回:
+            導入內容的統計信息
+        """
+        snapshot = read_snapshot(path)
+        self.clear()
+        imported_at = time.time()
+        
+        # 緩存數據保持為映射內存中的原始數據，訪問時才解碼
+        for entry in snapshot['cache_entries']:
+            cached = {
+                'payload': entry['payload'],
+                'timestamp': imported_at if refresh_timestamps else entry['timestamp']
+            }
+            if entry['data_type'] is None:
+                self._investigation_cache[entry['cache_key']] = cached
+            else:
+                self._investigation_cache.setdefault(entry['cache_key'], {})[entry['data_type']] = cached
+        
+        metadata = snapshot['metadata']
+        self._addresses_investigated = set(metadata.get('addresses_investigated', []))
+        self._transactions_analyzed = set(metadata.get('transactions_analyzed', []))
+        for key, value in metadata.get('state', {}).items():
+            self.set(key, value)
+        self.set_tx_data(snapshot['edges'])
+        
+        # 圖像寫入本會話的臨時目錄，保留原有的文件 ID
+        for file_id, png_bytes in snapshot['graphs'].items():
+            file_path = os.path.join(self._temp_dir, f"graph_{file_id}.png")
+            with open(file_path, 'wb') as f:
+                f.write(png_bytes)
+            self._graph_files[file_id] = file_path
+        
+        return {
+            'path': path,
+            'cache_entries': len(snapshot['cache_entries']),
+            'graph_edges': len(snapshot['edges']),
+            'graph_files': len(snapshot['graphs'])
+        }
+    
     def transform_misttrack_data(self, misttrack_data: Dict[str, Any]) -> List[Dict[str, str]]:
         """
         將 MistTrack 交易數據轉換為圖形代理所需的格式。
@@ -193,7 +493,8 @@ class SessionState:
                 "from": "0x123...",  # 發送地址
                 "to": "0x456...",    # 接收地址
                 "value": "1.23",     # 交易價值
-                "ts": "2023-04-01 12:34:56"  # 時間戳
+                "ts": "2023-04-01 12:34:56",  # 時間戳
+                "hash": "0xabc..."   # 交易哈希（響應中有時才包含）
             },
             ...
         ]
@@ -214,15 +515,16 @@ class SessionState:
                         "value": str(tx.get("value", "0")),
                         "ts": tx.get("timestamp", "")
                     }
-                    edges.append(edge)
                     
                     # 將此交易添加到已分析交易列表中
                     if "hash" in tx:
+                        edge["hash"] = tx["hash"]
                         self._transactions_analyzed.add(tx["hash"])
+                    edges.append(edge)
         except Exception as e:
             print(f"轉換交易數據時出錯: {e}")
             
         return edges
 
 # 全局會話狀態實例
-session_state = SessionState()
\ No newline at end of file
+session_state = SessionState(shared_cache=SharedCache.from_env())
\ No newline at end of file
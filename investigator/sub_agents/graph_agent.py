@@ -29,8 +29,11 @@ async def render_stored_tx_graph(custom_edges: Optional[List[Dict[str, str]]] =
         ]
         return render_tx_graph(no_data_edge)
     
-    # 使用會話狀態中的邊緣渲染圖
-    return render_tx_graph(edges)
+    if custom_edges:
+        return render_tx_graph(custom_edges)
+    
+    # 使用會話狀態中的邊緣渲染圖，交易數據未變化時復用上次的渲染結果
+    return session_state.get_rendered_tx_graph()
 
 graph_agent = Agent(
     model="gemini-2.0-flash",
@@ -1,10 +1,44 @@
 from google.adk.agents import Agent
 from investigator.services.misttrack import *
 from investigator.services.state import session_state
-from typing import Dict, Any, List, Optional
+from investigator.services.graph import summarize_tx_edges
+from investigator.services.snapshot import resolve_snapshot_path
+from investigator.services.propagation import propagate_cached_risk, PropagationMethod
+from typing import Dict, Any, List, Optional, Callable, Awaitable
 
 # 增強版的帶緩存 API 調用
 
+async def _get_address_data_cached(
+    coin: CoinType,
+    address: str,
+    data_type: str,
+    fetch: Callable[[], Awaitable[Dict[str, Any]]]
+) -> Dict[str, Any]:
+    """
+    先查緩存，未命中時在 single-flight 鎖內調用 API 並緩存結果，
+    避免多個會話或工作進程重複查詢同一地址。
+    命中時返回帶 from_cache 標志的副本，不修改緩存中的數據。
+    """
+    # 檢查緩存
+    cached_data = session_state.get_cached_address_data(coin, address, data_type)
+    if cached_data:
+        return {**cached_data, 'from_cache': True}
+    
+    async with session_state.single_flight(f"{coin}_{address}:{data_type}"):
+        # 等待鎖期間其他調用可能已寫入緩存
+        cached_data = session_state.get_cached_address_data(coin, address, data_type)
+        if cached_data:
+            return {**cached_data, 'from_cache': True}
+        
+        # 調用 API
+        result = await fetch()
+        
+        # 緩存結果
+        if result and 'error' not in result:
+            session_state.cache_address_data(coin, address, data_type, result)
+    
+    return result
+
 async def get_address_labels_cached(coin: CoinType, address: str) -> Dict[str, Any]:
     """
     獲取指定地址的標籤並緩存結果。
@@ -16,20 +50,9 @@ async def get_address_labels_cached(coin: CoinType, address: str) -> Dict[str, A
     返回:
         地址標籤信息
     """
-    # 檢查緩存
-    cached_data = session_state.get_cached_address_data(coin, address, 'labels')
-    if cached_data:
-        cached_data['from_cache'] = True
-        return cached_data
-    
-    # 調用 API
-    result = await get_address_labels(coin, address)
-    
-    # 緩存結果
-    if result and 'error' not in result:
-        session_state.cache_address_data(coin, address, 'labels', result)
-    
-    return result
+    return await _get_address_data_cached(
+        coin, address, 'labels', lambda: get_address_labels(coin, address)
+    )
 
 async def get_address_overview_cached(coin: CoinType, address: str) -> Dict[str, Any]:
     """
@@ -42,20 +65,9 @@ async def get_address_overview_cached(coin: CoinType, address: str) -> Dict[str,
     返回:
         地址概述信息
     """
-    # 檢查緩存
-    cached_data = session_state.get_cached_address_data(coin, address, 'overview')
-    if cached_data:
-        cached_data['from_cache'] = True
-        return cached_data
-    
-    # 調用 API
-    result = await get_address_overview(coin, address)
-    
-    # 緩存結果
-    if result and 'error' not in result:
-        session_state.cache_address_data(coin, address, 'overview', result)
-    
-    return result
+    return await _get_address_data_cached(
+        coin, address, 'overview', lambda: get_address_overview(coin, address)
+    )
 
 async def get_risk_score_cached(
     coin: CoinType,
@@ -75,29 +87,32 @@ async def get_risk_score_cached(
     """
     if address:
         # 檢查地址緩存
-        cached_data = session_state.get_cached_address_data(coin, address, 'risk_score')
-        if cached_data:
-            cached_data['from_cache'] = True
-            return cached_data
+        return await _get_address_data_cached(
+            coin, address, 'risk_score', lambda: get_risk_score(coin, address, txid)
+        )
     
     elif txid:
         # 檢查交易緩存
         cached_data = session_state.get_cached_transaction_data(coin, txid)
         if cached_data:
-            cached_data['from_cache'] = True
-            return cached_data
+            return {**cached_data, 'from_cache': True}
+        
+        async with session_state.single_flight(f"{coin}_tx_{txid}"):
+            cached_data = session_state.get_cached_transaction_data(coin, txid)
+            if cached_data:
+                return {**cached_data, 'from_cache': True}
+            
+            # 調用 API
+            result = await get_risk_score(coin, address, txid)
+            
+            # 緩存結果
+            if result and 'error' not in result:
+                session_state.cache_transaction_data(coin, txid, result)
+        
+        return result
     
     # 調用 API
-    result = await get_risk_score(coin, address, txid)
-    
-    # 緩存結果
-    if result and 'error' not in result:
-        if address:
-            session_state.cache_address_data(coin, address, 'risk_score', result)
-        elif txid:
-            session_state.cache_transaction_data(coin, txid, result)
-    
-    return result
+    return await get_risk_score(coin, address, txid)
 
 async def get_transactions_and_store(
     coin: CoinType,
@@ -121,51 +136,82 @@ async def get_transactions_and_store(
     返回:
         交易數據和狀態
     """
+    async def fetch() -> Dict[str, Any]:
+        # 調用原始函數
+        return await get_transactions_investigation(
+            coin=coin,
+            address=address,
+            start_timestamp=start_timestamp,
+            end_timestamp=end_timestamp,
+            tx_type=tx_type,
+            page=page
+        )
+    
+    # 時間過濾器會影響結果，沒有時間過濾器時才使用緩存
+    if start_timestamp or end_timestamp:
+        result = await fetch()
+        if result and "data" in result:
+            # 轉換為圖形代理所需的格式
+            tx_graph_data = session_state.transform_misttrack_data(result)
+            return _store_tx_graph_data(result, tx_graph_data, summarize_tx_edges(tx_graph_data))
+        return result
+    
     # 檢查緩存
     cache_key = f"tx_investigation_{tx_type}_{page}"
     cached_data = session_state.get_cached_address_data(coin, address, cache_key)
-    if cached_data and not start_timestamp and not end_timestamp:
-        # 時間過濾器會影響結果，沒有時間過濾器時才使用緩存
-        cached_data['from_cache'] = True
-        
-        # 確保圖形數據也存在
-        tx_graph_data = session_state.transform_misttrack_data(cached_data)
-        session_state.set_tx_data(tx_graph_data)
+    if cached_data:
+        return _store_cached_tx_graph_data(coin, address, cache_key, cached_data, from_cache=True)
+    
+    async with session_state.single_flight(f"{coin}_{address}:{cache_key}"):
+        cached_data = session_state.get_cached_address_data(coin, address, cache_key)
+        if cached_data:
+            return _store_cached_tx_graph_data(coin, address, cache_key, cached_data, from_cache=True)
         
-        cached_data["data_stored_for_graph"] = True
-        cached_data["graph_edge_count"] = len(tx_graph_data)
+        result = await fetch()
         
-        return cached_data
-    
-    # 調用原始函數
-    result = await get_transactions_investigation(
-        coin=coin,
-        address=address,
-        start_timestamp=start_timestamp,
-        end_timestamp=end_timestamp,
-        tx_type=tx_type,
-        page=page
-    )
-    
-    # 如果成功，轉換並存儲數據
-    if result and "data" in result:
         # 緩存交易調查結果
-        if not start_timestamp and not end_timestamp:
-            # 沒有時間過濾器的結果才緩存
+        if result and "data" in result:
             session_state.cache_address_data(coin, address, cache_key, result)
-        
-        # 轉換為圖形代理所需的格式
-        tx_graph_data = session_state.transform_misttrack_data(result)
-        
-        # 存儲在會話狀態中
-        session_state.set_tx_data(tx_graph_data)
-        
-        # 添加標志表示數據已存儲
-        result["data_stored_for_graph"] = True
-        result["graph_edge_count"] = len(tx_graph_data)
+            return _store_cached_tx_graph_data(coin, address, cache_key, result)
     
     return result
 
+def _store_cached_tx_graph_data(
+    coin: CoinType,
+    address: str,
+    cache_key: str,
+    result: Dict[str, Any],
+    from_cache: bool = False
+) -> Dict[str, Any]:
+    """使用按緩存數據記憶的邊緣和統計，緩存數據未變化時不重新轉換。"""
+    tx_graph_data = session_state.get_tx_graph_edges(coin, address, cache_key)
+    stats = session_state.get_tx_graph_stats(coin, address, cache_key)
+    return _store_tx_graph_data(result, tx_graph_data, stats, from_cache, source=f"{coin}_{address}:{cache_key}")
+
+def _store_tx_graph_data(
+    result: Dict[str, Any],
+    tx_graph_data: List[Dict[str, str]],
+    stats: Dict[str, Any],
+    from_cache: bool = False,
+    source: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    將圖形數據存儲在會話狀態中，並返回帶有標志的結果副本，不修改緩存中的數據。
+    source 為圖形數據所來自的緩存條目，用於按條目緩存渲染結果。
+    """
+    # 存儲在會話狀態中
+    session_state.set_tx_data(tx_graph_data, source)
+    
+    # 添加標志表示數據已存儲
+    flags = {
+        "data_stored_for_graph": True,
+        "graph_edge_count": len(tx_graph_data),
+        "graph_stats": stats
+    }
+    if from_cache:
+        flags["from_cache"] = True
+    return {**result, **flags}
+
 async def get_address_actions_cached(coin: CoinType, address: str) -> Dict[str, Any]:
     """
     獲取地址操作並緩存結果。
@@ -177,20 +223,9 @@ async def get_address_actions_cached(coin: CoinType, address: str) -> Dict[str,
     返回:
         地址操作信息
     """
-    # 檢查緩存
-    cached_data = session_state.get_cached_address_data(coin, address, 'actions')
-    if cached_data:
-        cached_data['from_cache'] = True
-        return cached_data
-    
-    # 調用 API
-    result = await get_address_actions(coin, address)
-    
-    # 緩存結果
-    if result and 'error' not in result:
-        session_state.cache_address_data(coin, address, 'actions', result)
-    
-    return result
+    return await _get_address_data_cached(
+        coin, address, 'actions', lambda: get_address_actions(coin, address)
+    )
 
 async def get_address_profile_cached(coin: CoinType, address: str) -> Dict[str, Any]:
     """
@@ -203,20 +238,64 @@ async def get_address_profile_cached(coin: CoinType, address: str) -> Dict[str,
     返回:
         地址資料信息
     """
-    # 檢查緩存
-    cached_data = session_state.get_cached_address_data(coin, address, 'profile')
-    if cached_data:
-        cached_data['from_cache'] = True
-        return cached_data
+    return await _get_address_data_cached(
+        coin, address, 'profile', lambda: get_address_profile(coin, address)
+    )
+
+async def get_risk_propagation(
+    coin: CoinType,
+    seed_addresses: Optional[List[str]] = None,
+    method: PropagationMethod = "haircut",
+    top_k: int = 20
+) -> Dict[str, Any]:
+    """
+    根據已緩存的交易圖、風險評分和標籤，計算風險從高風險地址沿交易擴散後各地址的暴露度。
+    只使用緩存數據，不會調用 API。
     
-    # 調用 API
-    result = await get_address_profile(coin, address)
+    參數:
+        coin: 加密貨幣類型（BTC, ETH, TRX等）
+        seed_addresses: 可選的額外種子地址；已緩存風險評分或高風險標籤（如 phishing、mixer）的地址會自動作為種子
+        method: 傳播方法，"haircut"（按價值比例污染）或 "pagerank"（個性化 PageRank）
+        top_k: 返回暴露度最高的地址數量
+        
+    返回:
+        按暴露度排序的地址列表
+    """
+    try:
+        return propagate_cached_risk(session_state, coin, seed_addresses, method, top_k)
+    except ValueError as e:
+        return {"error": str(e)}
+
+async def export_investigation_snapshot(name: str) -> Dict[str, Any]:
+    """
+    將當前調查的所有緩存數據、交易圖和圖像導出為快照，以便之後恢復或交給其他分析師。
+    快照保存在 SNAPSHOT_DIR 目錄下，同名快照會被覆蓋。
     
-    # 緩存結果
-    if result and 'error' not in result:
-        session_state.cache_address_data(coin, address, 'profile', result)
+    參數:
+        name: 快照名稱（字母、數字、點、下劃線和連字符）
+        
+    返回:
+        導出內容的統計信息
+    """
+    try:
+        return session_state.export_snapshot(resolve_snapshot_path(name))
+    except Exception as e:
+        return {"error": f"導出快照失敗: {e}"}
+
+async def import_investigation_snapshot(name: str) -> Dict[str, Any]:
+    """
+    從 SNAPSHOT_DIR 目錄下的快照恢復調查，替換當前的會話數據，不會調用 API。
     
-    return result
+    參數:
+        name: 快照名稱
+        
+    返回:
+        導入內容的統計信息
+    """
+    try:
+        return session_state.import_snapshot(resolve_snapshot_path(name))
+    except Exception as e:
+        return {"error": f"導入快照失敗: {e}"}
 
 async def get_investigation_summary() -> Dict[str, Any]:
     """
@@ -245,7 +324,10 @@ misttrack_agent = Agent(
         "- get_transactions_and_store: 調查並緩存地址的交易，同時為圖形渲染準備數據。需要 'coin'、'address'。\n"
         "- get_address_actions_cached: 分析並緩存地址的交易行為。需要 'coin'、'address'。\n"
         "- get_address_profile_cached: 獲取並緩存地址的資料信息。需要 'coin'、'address'。\n"
-        "- get_investigation_summary: 獲取當前調查的摘要信息，包括已調查的地址和交易。\n\n"
+        "- get_risk_propagation: 根據已緩存的交易、風險評分和標籤，計算風險沿交易圖擴散後各地址的暴露度（不調用 API）。需要 'coin'。可選：'seed_addresses'、'method'、'top_k'。\n"
+        "- get_investigation_summary: 獲取當前調查的摘要信息，包括已調查的地址和交易。\n"
+        "- export_investigation_snapshot: 將當前調查導出為快照。需要 'name'。\n"
+        "- import_investigation_snapshot: 從快照恢復調查，無需重新調用 API。需要 'name'。\n\n"
         "優先使用帶有 _cached 後綴的函數來獲取數據，這將自動緩存結果並提高性能。\n"
         "當需要視覺化交易數據時，使用 get_transactions_and_store 函數，這將自動為圖形代理準備數據。\n\n"
         "緩存的數據在會話期間保持有效，你可以通過 get_investigation_summary 查看當前緩存的內容。"
@@ -264,6 +346,9 @@ misttrack_agent = Agent(
         get_address_actions_cached,
         get_address_profile, 
         get_address_profile_cached,
-        get_investigation_summary
+        get_risk_propagation,
+        get_investigation_summary,
+        export_investigation_snapshot,
+        import_investigation_snapshot
     ],
 )
\ No newline at end of file
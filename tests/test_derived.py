@@ -0,0 +1,83 @@
+import time
+
+import pytest
+
+from investigator.services import state as state_module
+from investigator.services.derived import DerivedCache
+from investigator.services.shared_cache import SharedCache
+from investigator.services.state import SessionState
+
+def _transactions(*hashes):
+    return {"data": {"transactions": [
+        {"from_address": "0xa", "to_address": f"0x{h}", "value": "1", "timestamp": "", "hash": h}
+        for h in hashes
+    ]}}
+
+@pytest.fixture
+def render_calls(monkeypatch):
+    calls = []
+    def render(edges):
+        calls.append(len(edges))
+        return f"image-{len(edges)}"
+    monkeypatch.setattr(state_module, "render_tx_graph", render)
+    return calls
+
+def test_derived_cache_hits_until_source_version_changes():
+    cache = DerivedCache()
+    calls = []
+    compute = lambda: calls.append(1) or len(calls)
+
+    assert cache.get_or_compute("x", {"s": 1}, compute) == 1
+    assert cache.get_or_compute("x", {"s": 1}, compute) == 1
+    assert cache.get_or_compute("x", {"s": 2}, compute) == 2
+    cache.invalidate_source("s")
+    assert len(cache) == 0
+
+def test_edges_recomputed_after_source_is_recached():
+    state = SessionState()
+    state.cache_address_data("ETH", "0xa", "tx_investigation_all_1", _transactions("h1"))
+    first = state.get_tx_graph_edges("ETH", "0xa", "tx_investigation_all_1")
+    assert state.get_tx_graph_edges("ETH", "0xa", "tx_investigation_all_1") is first
+
+    state.cache_address_data("ETH", "0xa", "tx_investigation_all_1", _transactions("h1", "h2"))
+    assert len(state.get_tx_graph_edges("ETH", "0xa", "tx_investigation_all_1")) == 2
+
+def test_expired_source_invalidates_derived_results(tmp_path):
+    state = SessionState(shared_cache=SharedCache(str(tmp_path), ttl=0.05))
+    state.cache_address_data("ETH", "0xa", "tx_investigation_all_1", _transactions("h1"))
+    assert len(state.get_tx_graph_edges("ETH", "0xa", "tx_investigation_all_1")) == 1
+
+    time.sleep(0.1)
+    assert state.get_cached_address_data("ETH", "0xa", "tx_investigation_all_1") is None
+    assert state.get_tx_graph_edges("ETH", "0xa", "tx_investigation_all_1") == []
+
+def test_storing_same_tx_data_does_not_rerender(render_calls):
+    state = SessionState()
+    edges = state.transform_misttrack_data(_transactions("h1"))
+
+    state.set_tx_data(edges)
+    state.get_rendered_tx_graph()
+    state.set_tx_data(edges)
+    state.get_rendered_tx_graph()
+    assert render_calls == [1]
+
+    state.set_tx_data(list(edges))
+    state.get_rendered_tx_graph()
+    assert render_calls == [1, 1]
+
+def test_renders_cached_per_source_entry(render_calls):
+    state = SessionState()
+    state.cache_address_data("ETH", "0xa", "tx_investigation_all_1", _transactions("h1", "h2", "h3"))
+    state.cache_address_data("ETH", "0xb", "tx_investigation_all_1", _transactions("h4", "h5", "h6", "h7"))
+
+    # 在兩個地址之間來回切換，源條目未變化時不重新渲染
+    for address in ["0xa", "0xb", "0xa", "0xb"]:
+        source = f"ETH_{address}:tx_investigation_all_1"
+        state.set_tx_data(state.get_tx_graph_edges("ETH", address, "tx_investigation_all_1"), source)
+        state.get_rendered_tx_graph()
+    assert render_calls == [3, 4]
+
+    # 帶時間過濾的查詢結果不來自緩存，按 tx_data 重新渲染
+    state.set_tx_data(state.transform_misttrack_data(_transactions("h8")))
+    assert state.get_rendered_tx_graph() == "image-1"
+    assert render_calls == [3, 4, 1]
@@ -0,0 +1,37 @@
+import asyncio
+import json
+
+from investigator.loadtest.harness import run_load_test
+from investigator.loadtest.scripted_llm import build_scripts, load_scripts
+from investigator.services.state import session_state
+
+def test_load_test_smoke_and_restores_session_state():
+    session_state.cache_address_data("ETH", "0xreal", "labels", {"data": {"label_list": ["exchange"]}})
+    try:
+        report = asyncio.run(run_load_test(sessions=2, scripts=build_scripts(skip_render=True), api_latency=0))
+
+        assert report["completed"] == 2
+        assert report["failed"] == 0
+        assert report["api_requests"] == {
+            "/address_labels": 2,
+            "/risk_score": 2,
+            "/transactions_investigation": 2,
+        }
+        # 運行前的調查數據保留，壓測數據不會留在全局狀態中
+        assert session_state.get_cached_address_data("ETH", "0xreal", "labels") == {"data": {"label_list": ["exchange"]}}
+        assert session_state.get_investigation_summary()["addresses_investigated"] == ["0xreal"]
+    finally:
+        session_state.clear()
+
+def test_load_scripts_overrides_agents(tmp_path):
+    path = tmp_path / "scripts.json"
+    path.write_text(json.dumps({
+        "misttrack_crypto_agent": [
+            {"call": "get_address_labels_cached", "args": {"coin": "ETH", "address": "{address}"}},
+            {"call": "transfer_to_agent", "args": {"agent_name": "investigator_agent"}},
+        ]
+    }))
+    scripts = load_scripts(str(path), base=build_scripts(skip_render=True))
+
+    assert scripts["misttrack_crypto_agent"][0]["call"] == "get_address_labels_cached"
+    assert scripts["graph_agent"] == build_scripts(skip_render=True)["graph_agent"]
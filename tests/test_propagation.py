@@ -0,0 +1,80 @@
+import pytest
+
+from investigator.services.propagation import propagate_risk, propagate_cached_risk, dedupe_edges
+from investigator.services.state import SessionState
+
+def _edge(sender, receiver, value, tx_hash=None):
+    edge = {"from": sender, "to": receiver, "value": str(value), "ts": ""}
+    if tx_hash:
+        edge["hash"] = tx_hash
+    return edge
+
+def _tx(sender, receiver, value, tx_hash):
+    return {"from_address": sender, "to_address": receiver, "value": value, "timestamp": "", "hash": tx_hash}
+
+def test_haircut_is_value_weighted_average_of_inflows():
+    # b 收到 a 的 1 和 c 的 3，污染比例 1/4；d 只從 b 收款，繼承 1/4
+    edges = [_edge("a", "b", 1), _edge("c", "b", 3), _edge("b", "d", 2)]
+    ranked = dict(propagate_risk(edges, {"a": 1.0}))
+    assert ranked == pytest.approx({"a": 1.0, "b": 0.25, "d": 0.25})
+
+def test_pagerank_two_nodes():
+    # r_a = 0.15 + 0.85 * r_b（b 無流出，分數回到種子），r_b = 0.85 * r_a
+    ranked = dict(propagate_risk([_edge("a", "b", 1)], {"a": 1.0}, method="pagerank"))
+    r_a = 0.15 / (1 - 0.85 * 0.85)
+    assert ranked == pytest.approx({"a": r_a, "b": 0.85 * r_a})
+    assert sum(ranked.values()) == pytest.approx(1.0)
+
+def test_seed_outside_graph_is_kept():
+    ranked = dict(propagate_risk([_edge("a", "b", 1)], {"a": 1.0, "x": 0.5}))
+    assert ranked["x"] == pytest.approx(0.5)
+    assert dict(propagate_risk([], {"x": 0.5})) == pytest.approx({"x": 0.5})
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        propagate_risk([_edge("a", "b", 1)], {"a": 1.0}, method="fifo")
+
+def test_dedupe_by_hash_then_by_fields():
+    edges = [_edge("a", "b", 1, "h1"), _edge("a", "b", 1, "h1"), _edge("a", "b", 1), _edge("a", "b", 1)]
+    assert len(dedupe_edges(edges)) == 2
+
+def test_cached_overlapping_queries_are_not_double_counted():
+    state = SessionState()
+    txs = [_tx("S", "Y", 1, "h1"), _tx("Z", "Y", 1, "h2")]
+    state.cache_address_data("ETH", "Y", "tx_investigation_all_1", {"data": {"transactions": txs}})
+    state.cache_address_data("ETH", "Y", "tx_investigation_in_1", {"data": {"transactions": txs}})
+    state.cache_address_data("ETH", "S", "risk_score", {"data": {"score": 100}})
+
+    result = propagate_cached_risk(state, "ETH")
+    exposure = {r["address"]: r["exposure"] for r in result["ranked"]}
+    assert result["edge_count"] == 2
+    assert exposure["Y"] == pytest.approx(0.5)
+
+def test_explicit_seed_with_cached_zero_score_does_not_taint():
+    state = SessionState()
+    state.cache_address_data("ETH", "S", "tx_investigation_all_1", {"data": {"transactions": [_tx("S", "Y", 1, "h1")]}})
+    state.cache_address_data("ETH", "S", "risk_score", {"data": {"score": 0}})
+
+    result = propagate_cached_risk(state, "ETH", seed_addresses=["S"])
+    assert result["seed_count"] == 0
+    assert result["ranked"] == []
+
+def test_cached_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        propagate_cached_risk(SessionState(), "ETH", method="fifo")
+
+def test_cached_labels_seed_addresses_without_risk_score():
+    state = SessionState()
+    txs = [_tx("P", "Y", 1, "h1"), _tx("M", "Y", 3, "h2"), _tx("E", "Y", 4, "h3")]
+    state.cache_address_data("ETH", "Y", "tx_investigation_all_1", {"data": {"transactions": txs}})
+    state.cache_address_data("ETH", "P", "labels", {"data": {"label_list": ["Phishing"]}})
+    state.cache_address_data("ETH", "M", "labels", {"data": {"label_list": ["mixer", "defi"]}})
+    # 已緩存的評分優先於標籤
+    state.cache_address_data("ETH", "E", "labels", {"data": {"label_list": ["phishing"]}})
+    state.cache_address_data("ETH", "E", "risk_score", {"data": {"score": 0}})
+
+    result = propagate_cached_risk(state, "ETH")
+    exposure = {r["address"]: r["exposure"] for r in result["ranked"]}
+    # Y = (1 * 1.0 + 3 * 0.8 + 4 * 0) / 8
+    assert exposure == pytest.approx({"P": 1.0, "M": 0.8, "Y": 0.425})
+    assert result["seed_count"] == 2
@@ -0,0 +1,101 @@
+import asyncio
+import multiprocessing
+import os
+import time
+
+from investigator.services.shared_cache import SharedCache, STALE_TMP_AGE
+from investigator.services.state import session_state
+from investigator.sub_agents.misttrack_agent import _get_address_data_cached
+
+PROCESSES = 4
+COROUTINES = 5
+
+def _worker(directory, fetch_log, barrier, results):
+    session_state.clear()
+    session_state.set_shared_cache(SharedCache(directory))
+
+    async def fetch():
+        with open(fetch_log, "a") as f:
+            f.write(f"{os.getpid()}\n")
+        await asyncio.sleep(0.2)
+        return {"data": {"score": 80}}
+
+    async def run():
+        return await asyncio.gather(*(
+            _get_address_data_cached("ETH", "0xa", "risk_score", fetch)
+            for _ in range(COROUTINES)
+        ))
+
+    barrier.wait()
+    results.put([bool(r.get("from_cache")) for r in asyncio.run(run())])
+
+def test_single_flight_across_processes(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    fetch_log = str(tmp_path / "fetches.log")
+    barrier = ctx.Barrier(PROCESSES)
+    results = ctx.Queue()
+    workers = [
+        ctx.Process(target=_worker, args=(str(tmp_path / "cache"), fetch_log, barrier, results))
+        for _ in range(PROCESSES)
+    ]
+    for worker in workers:
+        worker.start()
+    flags = [flag for _ in workers for flag in results.get(timeout=30)]
+    for worker in workers:
+        worker.join(timeout=30)
+        assert worker.exitcode == 0
+
+    with open(fetch_log) as f:
+        assert len(f.read().split()) == 1
+    # 只有調用了 API 的那一個結果不帶 from_cache
+    assert flags.count(False) == 1
+    assert len(flags) == PROCESSES * COROUTINES
+
+def test_expired_entry_is_a_miss(tmp_path):
+    cache = SharedCache(str(tmp_path), ttl=60)
+    cache.set("fresh", {"v": 1})
+    cache.set("stale", {"v": 2}, timestamp=time.time() - 120)
+
+    assert cache.get("fresh")["data"] == {"v": 1}
+    assert cache.get("stale") is None
+    # 過期文件留給 sweep 刪除
+    assert len([n for n in os.listdir(tmp_path) if n.endswith(".json")]) == 2
+
+def test_set_replaces_atomically(tmp_path):
+    cache = SharedCache(str(tmp_path))
+    cache.set("key", {"v": 1})
+    cache.set("key", {"v": 2})
+    assert cache.get("key")["data"] == {"v": 2}
+    assert not [n for n in os.listdir(tmp_path) if n.endswith(".tmp")]
+
+def _age(path, seconds):
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+def test_sweep_removes_stale_files(tmp_path):
+    cache = SharedCache(str(tmp_path), ttl=60)
+    cache.set("fresh", {"v": 1})
+    cache.set("stale", {"v": 2})
+    _age(cache._path("stale", ".json"), 120)
+    stale_tmp = tmp_path / "crashed.tmp"
+    stale_tmp.write_text("{")
+    _age(stale_tmp, STALE_TMP_AGE + 1)
+    recent_tmp = tmp_path / "writing.tmp"
+    recent_tmp.write_text("{")
+
+    cache.sweep()
+
+    assert os.path.exists(cache._path("fresh", ".json"))
+    assert not os.path.exists(cache._path("stale", ".json"))
+    assert not stale_tmp.exists()
+    assert recent_tmp.exists()
+
+def test_sweep_caps_entries_without_ttl(tmp_path):
+    cache = SharedCache(str(tmp_path), max_entries=2)
+    for i in range(4):
+        cache.set(f"key{i}", {"v": i})
+        _age(cache._path(f"key{i}", ".json"), 100 - i)
+
+    cache.sweep()
+
+    assert [cache.get(f"key{i}") is not None for i in range(4)] == [False, False, True, True]
@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from investigator.services.shared_cache import SharedCache
+from investigator.services.snapshot import resolve_snapshot_path
+from investigator.services.state import SessionState
+
+def _transactions():
+    return {"data": {"transactions": [
+        {"from_address": "0xa", "to_address": "0xb", "value": 1.5, "timestamp": 1700000000, "hash": "h1"},
+        {"from_address": "0xb", "to_address": "0xc", "value": 2, "timestamp": 1700000100, "hash": "h2"},
+    ]}}
+
+def test_round_trip_with_numeric_timestamps(tmp_path):
+    state = SessionState()
+    state.cache_address_data("ETH", "0xa", "tx_investigation_all_1", _transactions())
+    state.cache_address_data("ETH", "0xa", "risk_score", {"data": {"score": 42}})
+    state.cache_transaction_data("ETH", "h1", {"data": {"score": 7}})
+    state.set_tx_data(state.transform_misttrack_data(_transactions()))
+    file_id = state.save_graph_to_file(b"png-bytes")
+
+    state.export_snapshot(str(tmp_path / "case"))
+    restored = SessionState()
+    restored.import_snapshot(str(tmp_path / "case"))
+
+    # 緩存的原始響應保持原類型，圖形邊緣以字符串存儲
+    assert restored.get_cached_address_data("ETH", "0xa", "tx_investigation_all_1") == _transactions()
+    assert restored.get_cached_address_data("ETH", "0xa", "risk_score") == {"data": {"score": 42}}
+    assert restored.get_cached_transaction_data("ETH", "h1") == {"data": {"score": 7}}
+    assert restored.get_tx_data() == [
+        {"from": "0xa", "to": "0xb", "value": "1.5", "ts": "1700000000", "hash": "h1"},
+        {"from": "0xb", "to": "0xc", "value": "2", "ts": "1700000100", "hash": "h2"},
+    ]
+    with open(restored.get_graph_file_path(file_id), "rb") as f:
+        assert f.read() == b"png-bytes"
+    assert set(restored.get_investigation_summary()["transactions_analyzed"]) == {"h1", "h2"}
+
+def test_import_refreshes_timestamps_by_default(tmp_path):
+    state = SessionState()
+    state.cache_address_data("ETH", "0xa", "labels", {"data": {"label_list": ["x"]}})
+    state._investigation_cache["ETH_0xa"]["labels"]["timestamp"] = 0  # 模擬很久以前獲取的數據
+    state.export_snapshot(str(tmp_path / "case"))
+
+    ttl_cache = SharedCache(str(tmp_path / "shared"), ttl=60)
+    restored = SessionState(ttl_cache)
+    restored.import_snapshot(str(tmp_path / "case"))
+    assert restored.get_cached_address_data("ETH", "0xa", "labels") == {"data": {"label_list": ["x"]}}
+
+    stale = SessionState(ttl_cache)
+    stale.import_snapshot(str(tmp_path / "case"), refresh_timestamps=False)
+    assert stale.get_cached_address_data("ETH", "0xa", "labels") is None
+
+def test_snapshot_names_are_confined_to_snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("SNAPSHOT_DIR", str(tmp_path))
+    assert resolve_snapshot_path("case-1.v2") == os.path.join(str(tmp_path), "case-1.v2")
+    for name in ["../etc", "/tmp/x", "a/b", ".hidden", "..", ""]:
+        with pytest.raises(ValueError):
+            resolve_snapshot_path(name)